@@ -1,9 +1,22 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import router
+from .services.translator_service import translator_service
 from .database import engine, Base
 
-app = FastAPI(title="AI Tribal Marketplace")
+# Bounded pool for blocking CPU work (image resizing, local translation).
+# Google Translate calls have their own pool in TranslatorService.
+EXECUTOR_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Load IndicTrans2 during startup instead of on the first Konkani request.
+PRELOAD_INDIC_MODEL = os.getenv("PRELOAD_INDIC_MODEL", "0") == "1"
+
+app = FastAPI(title="AI Tribal Marketplace", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,8 +27,29 @@ app.add_middleware(
 )
 
 @app.on_event("startup")
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("startup")
+async def configure_executor():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="trans")
+    )
+
+@app.on_event("startup")
+async def start_translator_service():
+    translator_service.start()
+
+@app.on_event("startup")
+async def preload_indic_model():
+    if PRELOAD_INDIC_MODEL:
+        from .services.indic_translator import load_model
+        await asyncio.get_running_loop().run_in_executor(None, load_model)
+
+@app.on_event("shutdown")
+async def stop_translator_service():
+    await translator_service.stop()
 
 app.include_router(router)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Index, Integer, String, Text, func
 from .database import Base
 
 
@@ -15,13 +15,20 @@ class Product(Base):
     # ──────────────────────────────────────────────────────────────────────
 
     # existing columns
-    english = Column(Text, nullable=False, unique=True)
+    english = Column(Text, nullable=False)
     hindi   = Column(Text, nullable=True)
     marathi = Column(Text, nullable=True)
     bengali = Column(Text, nullable=True)
     tamil   = Column(Text, nullable=True)
     telugu  = Column(Text, nullable=True)
 
+    # english is unique. A plain btree index can't hold long captions on
+    # PostgreSQL, so there uniqueness is enforced on md5(english) instead.
+    __table_args__ = (
+        Index("uq_products_english", english, unique=True).ddl_if(dialect="sqlite"),
+        Index("uq_products_english_md5", func.md5(english), unique=True).ddl_if(dialect="postgresql"),
+    )
+
 
 # ============================================================
 # MIGRATION (Alembic)
@@ -38,4 +45,9 @@ class Product(Base):
 #   ALTER TABLE products ADD COLUMN region    VARCHAR(255);
 #   ALTER TABLE products ADD COLUMN question  TEXT;
 #
+# On PostgreSQL move uniqueness of english onto its md5:
+#
+#   CREATE UNIQUE INDEX CONCURRENTLY uq_products_english_md5 ON products (md5(english));
+#   ALTER TABLE products DROP CONSTRAINT products_english_key;
+#
 # ============================================================
\ No newline at end of file
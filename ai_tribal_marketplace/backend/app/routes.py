@@ -1,15 +1,32 @@
 from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Literal
 import asyncio
+import hashlib
+import orjson
 import tempfile
-import os
-from contextlib import asynccontextmanager
+from functools import lru_cache
+from cachetools import LRUCache
+from PIL import UnidentifiedImageError
 
-from .database import get_db
+from .database import SessionLocal, engine, get_db, insert
 from .models import Product
-from .services.text_generator import generate_description, generate_history
-from .services.translator import translate
+from .services.text_generator import (
+    OutputTruncated,
+    generate_description,
+    generate_description_stream,
+    generate_history,
+)
+from .services.translator_service import translator_service
+from .utils.image_preprocess import (
+    MAX_VISION_PIXELS,
+    MAX_VISION_SIDE,
+    vision_image_bytes,
+    vision_side,
+)
+from .utils.singleflight import SingleFlight
 
 router = APIRouter()
 
@@ -17,10 +34,78 @@ router = APIRouter()
 # Configuration
 # ---------------------------------------------------------------------------
 
-SUPPORTED_LANGUAGES = {"hindi", "marathi", "bengali", "tamil", "telugu"}
+# Translation columns on Product, in a fixed order.
+_LANG_COLS = ("hindi", "marathi", "bengali", "tamil", "telugu")
+
+SUPPORTED_LANGUAGES = frozenset(_LANG_COLS)
 
 OLLAMA_TIMEOUT_SECONDS = 90
 
+# Uploads are read in chunks and kept in memory up to the spool size,
+# beyond which they roll over to disk.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SPOOL_MAX_SIZE = 2 * 1024 * 1024
+
+TRANSLATION_CACHE_SIZE = 512
+
+VISION_CACHE_SIZE = 1024
+
+# english text -> {language: translation} for rows already stored in the DB
+_trans_cache: LRUCache[str, dict[str, str]] = LRUCache(maxsize=TRANSLATION_CACHE_SIZE)
+
+# image digest + generation params -> parsed vision model result
+_vision_cache: LRUCache[str, dict] = LRUCache(maxsize=VISION_CACHE_SIZE)
+
+# Identical requests in flight share one response; identical vision calls
+# (same image and prompt, any languages or endpoint) share one model call.
+_request_flights = SingleFlight()
+_vision_flights = SingleFlight()
+
+_ON_POSTGRES = engine.dialect.name == "postgresql"
+
+# The unique index on english (see models.py), as the upsert's conflict target.
+_ENGLISH_KEY = [func.md5(Product.english)] if _ON_POSTGRES else [Product.english]
+
+# Statements are built once so every request reuses the same compiled SQL.
+@lru_cache(maxsize=None)
+def _translation_lookup(languages: tuple[str, ...]):
+    """
+    SELECT of just the given translation columns for one english text.
+    """
+    stmt = (
+        select(Product.id, *(getattr(Product, lang) for lang in languages))
+        .where(Product.english == bindparam("english"))
+    )
+    if _ON_POSTGRES:
+        # Lets PostgreSQL use the unique index on md5(english).
+        stmt = stmt.where(func.md5(Product.english) == func.md5(bindparam("english")))
+    return stmt
+
+
+_HISTORY_COLUMNS = (
+    Product.id,
+    Product.art_name,
+    Product.art_style,
+    Product.region,
+    Product.question,
+    Product.english,
+)
+
+_TRANSLATION_COLUMNS = tuple(getattr(Product, lang) for lang in _LANG_COLS)
+
+
+def _history_page(*columns):
+    return (
+        select(*columns)
+        .order_by(Product.id.desc())
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
+
+
+_HISTORY_PAGE = _history_page(*_HISTORY_COLUMNS)
+_HISTORY_PAGE_WITH_TRANSLATIONS = _history_page(*_HISTORY_COLUMNS, *_TRANSLATION_COLUMNS)
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -38,106 +123,194 @@ def _parse_languages(languages: str) -> list[str]:
     return langs
 
 
-@asynccontextmanager
-async def temp_image_file(upload: UploadFile):
+async def _spool_upload(upload: UploadFile):
     """
-    Safely save uploaded image to a temp file and ensure cleanup.
+    Stream the upload into a spooled temp file, hashing it on the way.
+    Returns (file, blake2b hex digest).
     """
-    contents = await upload.read()
-    suffix = os.path.splitext(upload.filename)[1] or ".jpg"
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+    digest = hashlib.blake2b(digest_size=16)
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest()
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    try:
-        tmp.write(contents)
-        tmp.close()
-        yield tmp.name
-    finally:
-        try:
-            os.remove(tmp.name)
-        except FileNotFoundError:
-            pass
 
+def _request_key(digest: str, *params) -> str:
+    """
+    Identify a generation request by image digest and its parameters.
+    """
+    return "||".join([digest, *map(str, params)])
 
-async def run_with_timeout(func, timeout: int = OLLAMA_TIMEOUT_SECONDS):
+
+async def read_image(source, max_side: int = MAX_VISION_SIDE) -> bytes:
     """
-    Run blocking AI call in threadpool with timeout.
+    Read the spooled upload as the bytes sent to the vision model,
+    downscaling it off the event loop when needed.
     """
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     try:
-        return await asyncio.wait_for(
-            loop.run_in_executor(None, func),
-            timeout=timeout,
+        return await loop.run_in_executor(
+            None, vision_image_bytes, source, MAX_VISION_PIXELS, max_side
+        )
+    except UnidentifiedImageError:
+        raise HTTPException(
+            status_code=415,
+            detail="Uploaded file is not a supported image.",
         )
+
+
+async def _vision_result(ai_key: str, call) -> dict:
+    """
+    Vision model result for `ai_key`: from the cache, from an identical
+    call already in flight, or by awaiting `call()` under the timeout.
+    """
+    ai_result = _vision_cache.get(ai_key)
+    if ai_result is not None:
+        return ai_result
+
+    async def _run():
+        ai_result = await run_with_timeout(call())
+        _vision_cache[ai_key] = ai_result
+        return ai_result
+
+    return await _vision_flights.run(ai_key, _run)
+
+
+async def run_with_timeout(call, timeout: int = OLLAMA_TIMEOUT_SECONDS):
+    """
+    Await AI call with timeout.
+    """
+    try:
+        return await asyncio.wait_for(call, timeout=timeout)
     except asyncio.TimeoutError:
         raise HTTPException(
             status_code=504,
             detail="AI model timed out. Please try again.",
         )
+    except OutputTruncated as e:
+        raise HTTPException(status_code=502, detail=str(e))
 
 
 async def _resolve_translations(
     english: str,
     requested_languages: list[str],
-    db: Session,
+    db: AsyncSession,
 ):
-    existing = db.query(Product).filter(Product.english == english).first()
-    cached = {}
+    """
+    Returns (translations, whether the row needs saving).
+    """
+    known = _trans_cache.get(english)
+    if known is not None and all(l in known for l in requested_languages):
+        return {l: known[l] for l in requested_languages}, False
 
-    if existing:
-        for lang in requested_languages:
-            value = getattr(existing, lang, None)
-            if value:
-                cached[lang] = value
+    # Nothing to look up: the upsert alone takes care of an existing row.
+    if not requested_languages:
+        return {}, True
 
+    known = known or {}
+    wanted = tuple(sorted({l for l in requested_languages if l not in known}))
+
+    result = await db.execute(_translation_lookup(wanted), {"english": english})
+    row = result.first()
+
+    if row is not None:
+        stored = {lang: value for lang, value in row._mapping.items() if lang in wanted and value}
+        known = {**known, **stored}
+        _trans_cache[english] = known
+
+    cached = {l: known[l] for l in requested_languages if l in known}
     missing = [l for l in requested_languages if l not in cached]
 
-    loop = asyncio.get_event_loop()
-    fresh = {}
-    for lang in missing:
-        translation = await loop.run_in_executor(None, translate, english, lang)
-        fresh[lang] = translation
+    fresh = await translator_service.translate_batch(english, missing)
 
-    return {**cached, **fresh}, existing
+    return {**cached, **fresh}, bool(fresh) or row is None
 
 
 def _make_db_saver(
-    db: Session,
     english: str,
     art_name: str,
     art_style: str,
     region: str,
     translations: dict[str, str],
-    existing: "Product | None",
     question: str | None = None,
 ):
-    def _save():
-        try:
-            if existing:
-                for lang, value in translations.items():
-                    setattr(existing, lang, value)
-                db.commit()
-            else:
-                product = Product(
-                    english=english,
-                    art_name=art_name,
-                    art_style=art_style,
-                    region=region,
-                    question=question,
-                    hindi=translations.get("hindi"),
-                    marathi=translations.get("marathi"),
-                    bengali=translations.get("bengali"),
-                    tamil=translations.get("tamil"),
-                    telugu=translations.get("telugu"),
-                )
-                db.add(product)
-                db.commit()
-        except Exception:
-            db.rollback()
-            raise
+    async def _save():
+        stmt = insert(Product).values(
+            english=english,
+            art_name=art_name,
+            art_style=art_style,
+            region=region,
+            question=question,
+            **{lang: translations.get(lang) for lang in _LANG_COLS},
+        )
+        updates = {
+            lang: stmt.excluded[lang]
+            for lang in _LANG_COLS
+            if translations.get(lang)
+        }
+        if updates:
+            stmt = stmt.on_conflict_do_update(index_elements=_ENGLISH_KEY, set_=updates)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=_ENGLISH_KEY)
+
+        # Own session: the request's session is closed once the response
+        # is sent, before background tasks run.
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+        _trans_cache[english] = {**_trans_cache.get(english, {}), **translations}
 
     return _save
 
 
+async def _translate_and_save(
+    ai_result: dict,
+    requested_languages: list[str],
+    db: AsyncSession,
+    background_tasks: BackgroundTasks | None,
+    question: str | None = None,
+) -> dict:
+    """
+    After the vision call: translate, schedule the save and build the
+    response. Scholar mode passes the question it answered.
+    """
+    english   = ai_result["english"]
+    art_name  = ai_result.get("art_name", "Unknown Art")
+    art_style = ai_result.get("art_style", "")
+    region    = ai_result.get("region", "India")
+
+    translations, needs_save = await _resolve_translations(
+        english, requested_languages, db
+    )
+
+    if needs_save:
+        saver = _make_db_saver(
+            english, art_name, art_style, region, translations, question=question
+        )
+
+        if background_tasks:
+            background_tasks.add_task(saver)
+        else:
+            await saver()
+
+    response = {
+        "art_name":     art_name,
+        "art_style":    art_style,
+        "region":       region,
+    }
+    if question is not None:
+        response["question"] = question
+    response["english"] = english
+    response["translations"] = translations
+    return response
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
 # ---------------------------------------------------------------------------
 # Endpoint 1: Creator Mode
 # ---------------------------------------------------------------------------
@@ -150,47 +323,34 @@ async def generate(
     audience: Literal["general", "buyer", "student", "children"] = Query(default="general"),
     tone: Literal["poetic", "informative", "storytelling", "academic"] = Query(default="poetic"),
     background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         requested_languages = _parse_languages(languages) if languages.strip() else []
 
-        async with temp_image_file(file) as image_path:
+        spool, digest = await _spool_upload(file)
+        key = _request_key(digest, "creator", length, audience, tone, *requested_languages)
 
-            ai_result = await run_with_timeout(
-                lambda: generate_description(
-                    image_path,
-                    length=length,
-                    audience=audience,
-                    tone=tone,
-                )
+        async def _describe():
+            image_bytes = await read_image(spool, vision_side(length))
+            return await generate_description(
+                image_bytes,
+                length=length,
+                audience=audience,
+                tone=tone,
             )
 
-        english   = ai_result["english"]
-        art_name  = ai_result.get("art_name", "Unknown Art")
-        art_style = ai_result.get("art_style", "")
-        region    = ai_result.get("region", "India")
-
-        translations, existing = await _resolve_translations(
-            english, requested_languages, db
-        )
+        async def _run():
+            ai_result = await _vision_result(
+                _request_key(digest, "creator", length, audience, tone), _describe
+            )
 
-        saver = _make_db_saver(
-            db, english, art_name, art_style, region, translations, existing
-        )
+            return await _translate_and_save(
+                ai_result, requested_languages, db, background_tasks
+            )
 
-        if background_tasks:
-            background_tasks.add_task(saver)
-        else:
-            saver()
-
-        return {
-            "art_name":     art_name,
-            "art_style":    art_style,
-            "region":       region,
-            "english":      english,
-            "translations": translations,
-        }
+        with spool:
+            return await _request_flights.run(key, _run)
 
     except HTTPException:
         raise
@@ -198,6 +358,88 @@ async def generate(
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
+# ---------------------------------------------------------------------------
+# Endpoint 1b: Creator Mode, streamed
+# ---------------------------------------------------------------------------
+
+@router.post("/generate/stream")
+async def generate_stream(
+    file: UploadFile = File(...),
+    languages: str = Query(default=""),
+    length: Literal["short", "medium", "detailed"] = Query(default="medium"),
+    audience: Literal["general", "buyer", "student", "children"] = Query(default="general"),
+    tone: Literal["poetic", "informative", "storytelling", "academic"] = Query(default="poetic"),
+    background_tasks: BackgroundTasks = None,
+):
+    """
+    Server-sent events: `token` events carry model output as it is
+    generated, followed by one `result` event with the same body as
+    /generate/ (or an `error` event).
+    """
+    requested_languages = _parse_languages(languages) if languages.strip() else []
+
+    spool, digest = await _spool_upload(file)
+    ai_key = _request_key(digest, "creator", length, audience, tone)
+
+    async def _describe():
+        image_bytes = await read_image(spool, vision_side(length))
+        return await generate_description(
+            image_bytes, length=length, audience=audience, tone=tone
+        )
+
+    async def _events():
+        with spool:
+            try:
+                ai_result = _vision_cache.get(ai_key)
+                if ai_result is None and _vision_flights.in_flight(ai_key):
+                    # Join the identical call instead of streaming a second
+                    # one; the result arrives without token events.
+                    ai_result = await _vision_result(ai_key, _describe)
+
+                if ai_result is None:
+                    image_bytes = await read_image(spool, vision_side(length))
+
+                    loop = asyncio.get_running_loop()
+                    deadline = loop.time() + OLLAMA_TIMEOUT_SECONDS
+                    stream = generate_description_stream(
+                        image_bytes,
+                        length=length,
+                        audience=audience,
+                        tone=tone,
+                    )
+                    try:
+                        while True:
+                            # Same overall limit as run_with_timeout, so a
+                            # stalled model can't hold the response open.
+                            try:
+                                part = await run_with_timeout(
+                                    stream.__anext__(), deadline - loop.time()
+                                )
+                            except StopAsyncIteration:
+                                break
+                            if isinstance(part, dict):
+                                ai_result = part
+                            else:
+                                yield _sse("token", {"text": part})
+                    finally:
+                        await stream.aclose()
+                    _vision_cache[ai_key] = ai_result
+
+                # The request's own session is closed before the body streams.
+                async with SessionLocal() as db:
+                    response = await _translate_and_save(
+                        ai_result, requested_languages, db, background_tasks
+                    )
+                yield _sse("result", response)
+
+            except HTTPException as e:
+                yield _sse("error", {"detail": e.detail})
+            except Exception as e:
+                yield _sse("error", {"detail": f"Generation failed: {str(e)}"})
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
+
+
 # ---------------------------------------------------------------------------
 # Endpoint 2: Scholar Mode
 # ---------------------------------------------------------------------------
@@ -210,49 +452,125 @@ async def generate_art_history(
         default="Tell me the history and origins of this art form.",
     ),
     background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         requested_languages = _parse_languages(languages) if languages.strip() else []
 
-        async with temp_image_file(file) as image_path:
+        spool, digest = await _spool_upload(file)
+        key = _request_key(digest, "scholar", question, *requested_languages)
 
-            ai_result = await run_with_timeout(
-                lambda: generate_history(image_path, question=question)
+        async def _answer():
+            image_bytes = await read_image(spool)
+            return await generate_history(image_bytes, question=question)
+
+        async def _run():
+            ai_result = await _vision_result(
+                _request_key(digest, "scholar", " ".join(question.lower().split())), _answer
             )
 
-        english   = ai_result["english"]
-        art_name  = ai_result.get("art_name", "Unknown Art")
-        art_style = ai_result.get("art_style", "")
-        region    = ai_result.get("region", "India")
-        q_text    = ai_result.get("question", question)
+            return await _translate_and_save(
+                ai_result,
+                requested_languages,
+                db,
+                background_tasks,
+                question=question,
+            )
 
-        translations, existing = await _resolve_translations(
-            english, requested_languages, db
-        )
+        with spool:
+            return await _request_flights.run(key, _run)
 
-        saver = _make_db_saver(
-            db, english, art_name, art_style, region, translations, existing, question=q_text
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"History generation failed: {str(e)}")
+
+
+# ---------------------------------------------------------------------------
+# Endpoint 2b: Creator and Scholar Mode together
+# ---------------------------------------------------------------------------
+
+@router.post("/generate/full")
+async def generate_full(
+    file: UploadFile = File(...),
+    languages: str = Query(default=""),
+    length: Literal["short", "medium", "detailed"] = Query(default="medium"),
+    audience: Literal["general", "buyer", "student", "children"] = Query(default="general"),
+    tone: Literal["poetic", "informative", "storytelling", "academic"] = Query(default="poetic"),
+    question: str = Query(
+        default="Tell me the history and origins of this art form.",
+    ),
+    background_tasks: BackgroundTasks = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Description and history of one image in a single request, with both
+    vision calls running concurrently.
+    """
+    try:
+        requested_languages = _parse_languages(languages) if languages.strip() else []
+
+        spool, digest = await _spool_upload(file)
+        key = _request_key(
+            digest, "full", length, audience, tone, question, *requested_languages
         )
 
-        if background_tasks:
-            background_tasks.add_task(saver)
-        else:
-            saver()
-
-        return {
-            "art_name":     art_name,
-            "art_style":    art_style,
-            "region":       region,
-            "question":     q_text,
-            "english":      english,
-            "translations": translations,
-        }
+        # side -> task reading the upload at that size; each size is read
+        # once, and only if a vision call that needs it misses the cache.
+        image_tasks: dict[int, asyncio.Task] = {}
+        read_lock = asyncio.Lock()
+
+        async def _read(max_side: int) -> bytes:
+            async with read_lock:  # both sizes come from the same spool
+                spool.seek(0)
+                return await read_image(spool, max_side)
+
+        def _image(max_side: int) -> asyncio.Task:
+            if max_side not in image_tasks:
+                image_tasks[max_side] = asyncio.create_task(_read(max_side))
+            return image_tasks[max_side]
+
+        async def _describe():
+            return await generate_description(
+                await _image(vision_side(length)), length=length, audience=audience, tone=tone
+            )
+
+        async def _answer():
+            # Same size as /generate/history, which shares this cache entry
+            return await generate_history(await _image(MAX_VISION_SIDE), question=question)
+
+        async def _run():
+            description, history = await asyncio.gather(
+                _vision_result(_request_key(digest, "creator", length, audience, tone), _describe),
+                _vision_result(
+                    _request_key(digest, "scholar", " ".join(question.lower().split())), _answer
+                ),
+            )
+
+            async def _history_side():
+                # Own session: one AsyncSession can't serve two concurrent queries.
+                async with SessionLocal() as history_db:
+                    return await _translate_and_save(
+                        history,
+                        requested_languages,
+                        history_db,
+                        background_tasks,
+                        question=question,
+                    )
+
+            described, answered = await asyncio.gather(
+                _translate_and_save(description, requested_languages, db, background_tasks),
+                _history_side(),
+            )
+            return {"description": described, "history": answered}
+
+        with spool:
+            return await _request_flights.run(key, _run)
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"History generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
 # ---------------------------------------------------------------------------
@@ -260,32 +578,13 @@ async def generate_art_history(
 # ---------------------------------------------------------------------------
 
 @router.get("/history/")
-def get_history(
+async def get_history(
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    include: Literal["translations"] | None = Query(default=None),
+    db: AsyncSession = Depends(get_db),
 ):
-    products = (
-        db.query(Product)
-        .order_by(Product.id.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    stmt = _HISTORY_PAGE_WITH_TRANSLATIONS if include == "translations" else _HISTORY_PAGE
+    result = await db.execute(stmt, {"skip": skip, "limit": limit})
 
-    return [
-        {
-            "id":        p.id,
-            "art_name":  p.art_name,
-            "art_style": p.art_style,
-            "region":    p.region,
-            "question":  p.question,
-            "english":   p.english,
-            "hindi":     p.hindi,
-            "marathi":   p.marathi,
-            "bengali":   p.bengali,
-            "tamil":     p.tamil,
-            "telugu":    p.telugu,
-        }
-        for p in products
-    ]
\ No newline at end of file
+    return [dict(row._mapping) for row in result]
@@ -0,0 +1,93 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Callable, Hashable
+
+
+class MicroBatcher:
+    """
+    Collects calls that arrive within a short window and runs them as one
+    blocking `batch_fn(items, group)` call per group in the default executor.
+    `batch_fn` may return an exception in place of a result to fail only
+    that item.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list, Hashable], list],
+        max_batch_size: int = 32,
+        max_wait: float = 0.02,
+    ):
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._dispatches: set[asyncio.Task] = set()
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, _, fut = self._queue.get_nowait()
+            fut.cancel()
+        self._worker = None
+        self._queue = None
+
+    async def submit(self, item: Any, group: Hashable = None) -> Any:
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, group, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = defaultdict(list)
+            for entry in batch:
+                groups[entry[1]].append(entry)
+
+            for group, entries in groups.items():
+                task = loop.create_task(self._dispatch(group, entries))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, group: Hashable, entries: list):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _, _ in entries]
+        try:
+            results = await loop.run_in_executor(None, self._batch_fn, items, group)
+        except Exception as e:
+            for _, _, fut in entries:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, _, fut), result in zip(entries, results):
+            if fut.done():
+                continue
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
@@ -1,8 +1,15 @@
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import os
 import torch
 
+from .batcher import MicroBatcher
+
 _MODEL = None
 _TOKENIZER = None
+_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Greedy decoding by default; raise for higher quality at ~N× the compute.
+NUM_BEAMS = int(os.getenv("INDIC_BEAMS", "1"))
 
 
 def load_model():
@@ -12,34 +19,56 @@ def load_model():
         model_name = "ai4bharat/indictrans2-en-indic-dist-200M"
 
         _TOKENIZER = AutoTokenizer.from_pretrained(model_name)
-        _MODEL = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        _MODEL = AutoModelForSeq2SeqLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16 if _DEVICE == "cuda" else torch.float32,
+        ).to(_DEVICE)
 
         _MODEL.eval()
 
 
-def translate_konkani(text: str):
+def translate_konkani_batch(texts: list[str]) -> list[str]:
     load_model()
 
     tokenizer = _TOKENIZER
     model = _MODEL
 
     inputs = tokenizer(
-        text,
+        texts,
+        padding=True,
         return_tensors="pt",
         src_lang="eng_Latn",
         tgt_lang="gom_Deva"
-    )
+    ).to(_DEVICE)
 
     with torch.no_grad():
         generated = model.generate(
             **inputs,
             max_length=200,
-            num_beams=4
+            num_beams=NUM_BEAMS,
+            do_sample=False,
+            use_cache=True
         )
 
-    output = tokenizer.batch_decode(
+    outputs = tokenizer.batch_decode(
         generated,
         skip_special_tokens=True
-    )[0].strip()
+    )
+
+    return [output.strip() for output in outputs]
+
+
+def translate_konkani(text: str):
+    return translate_konkani_batch([text])[0]
+
+
+# Concurrent requests share one forward pass of up to 16 texts.
+_batcher = MicroBatcher(
+    lambda texts, _: translate_konkani_batch(texts),
+    max_batch_size=16,
+    max_wait=0.015,
+)
+
 
-    return output
+async def translate_konkani_async(text: str) -> str:
+    return await _batcher.submit(text)
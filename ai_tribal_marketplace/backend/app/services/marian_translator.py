@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+# One opus-mt checkpoint per target language
+MODELS = {
+    "hindi": "Helsinki-NLP/opus-mt-en-hi",
+    "marathi": "Helsinki-NLP/opus-mt-en-mr",
+    "bengali": "Helsinki-NLP/opus-mt-en-bn",
+}
+
+# "torch" (default) or "onnx" for ONNX Runtime with full graph fusion
+BACKEND = os.getenv("TRANSLATOR_BACKEND", "torch")
+
+DEVICE = "cuda" if BACKEND == "torch" and torch.cuda.is_available() else "cpu"
+
+BATCH_SIZE = 16
+
+# Marian's position limit. Longer sentences are refused rather than cut.
+MAX_SOURCE_TOKENS = 512
+MAX_TARGET_TOKENS = 512
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])(\s+)")
+
+
+class TranslationTooLong(ValueError):
+    """
+    The text has a sentence the model cannot translate in full.
+    """
+
+# language -> (tokenizer, model), filled on first use
+_loaded = {}
+
+# Batches run in executor threads; without these two of them could load
+# the same checkpoint at once on a cold start. Only a miss takes a lock,
+# and only that language's.
+_load_locks = {language: threading.Lock() for language in MODELS}
+
+def _load(language):
+    loaded = _loaded.get(language)
+    if loaded is None:
+        with _load_locks[language]:
+            loaded = _loaded.get(language)
+            if loaded is None:
+                loaded = _loaded[language] = _load_checkpoint(language)
+    return loaded
+
+def _load_checkpoint(language):
+    # Loaded on first use so importing this module costs no model memory
+    name = MODELS[language]
+    tokenizer = AutoTokenizer.from_pretrained(name)
+
+    if BACKEND == "onnx":
+        from onnxruntime import GraphOptimizationLevel, SessionOptions
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        options = SessionOptions()
+        options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Hub checkpoints are converted on load; MODELS may instead point
+        # at directories pre-exported with `optimum-cli export onnx`
+        return tokenizer, ORTModelForSeq2SeqLM.from_pretrained(
+            name,
+            export=not os.path.isdir(name),
+            provider="CPUExecutionProvider",
+            session_options=options,
+        )
+
+    if DEVICE == "cuda":
+        model = AutoModelForSeq2SeqLM.from_pretrained(name, torch_dtype=torch.float16).to(DEVICE)
+    else:
+        # INT8 weights for the Linear layers: ~4x less memory traffic on CPU
+        model = torch.ao.quantization.quantize_dynamic(
+            AutoModelForSeq2SeqLM.from_pretrained(name),
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+        )
+
+    model.eval()
+    return tokenizer, model
+
+def _split_sentences(text):
+    """
+    (sentences, separators), where separators[i] is the whitespace that
+    followed sentences[i], so paragraph breaks survive translation.
+    """
+    parts = _SENTENCE_RE.split(text.strip())
+    return parts[0::2], parts[1::2] + [""]
+
+def _translate_sentences(sentences, language):
+    """
+    Translations in input order, None where the sentence is over the
+    source limit or its output would have been cut off.
+    """
+    tokenizer, model = _load(language)
+    ids = tokenizer(sentences)["input_ids"]
+
+    # Sorted by length, each sub-batch pads only to its own longest text
+    order = sorted(
+        (i for i in range(len(ids)) if len(ids[i]) <= MAX_SOURCE_TOKENS),
+        key=lambda i: len(ids[i]),
+    )
+    results = [None] * len(sentences)
+
+    for start in range(0, len(order), BATCH_SIZE):
+        chunk = order[start:start + BATCH_SIZE]
+        inputs = tokenizer.pad(
+            {"input_ids": [ids[i] for i in chunk]}, return_tensors="pt"
+        ).to(DEVICE)
+        longest = max(len(ids[i]) for i in chunk)
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=min(MAX_TARGET_TOKENS, 2 * longest + 16),
+                num_beams=1,
+            )
+
+        for i, output in zip(chunk, outputs):
+            # No end-of-sequence token means generation hit the cap
+            if tokenizer.eos_token_id in output.tolist():
+                results[i] = tokenizer.decode(output, skip_special_tokens=True)
+
+    return results
+
+def translate_batch(texts, language="hindi", return_exceptions=False):
+    """
+    Translate each text sentence by sentence. A text that cannot be
+    translated in full raises TranslationTooLong, or with
+    `return_exceptions` gets the exception in its place.
+    """
+    split = [_split_sentences(text) for text in texts]
+    translated = iter(_translate_sentences([s for parts, _ in split for s in parts], language))
+
+    results = []
+    for text, (parts, separators) in zip(texts, split):
+        pieces = [next(translated) for _ in parts]
+        if None in pieces:
+            error = TranslationTooLong(f"Cannot translate in full: {text[:60]!r}")
+            if not return_exceptions:
+                raise error
+            results.append(error)
+        else:
+            results.append("".join(p + sep for p, sep in zip(pieces, separators)))
+
+    return results
+
+def translate(text, language="hindi"):
+    return translate_batch([text], language)[0]
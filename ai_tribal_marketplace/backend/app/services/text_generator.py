@@ -1,47 +1,150 @@
-import json
-import re
+import asyncio
+import io
+import os
+import httpx
 import ollama
+import orjson
 from PIL import Image
 from typing import Literal
 
+from ..utils.image_preprocess import MAX_VISION_PIXELS, vision_image_bytes, vision_side
+from ..utils.retry import retry_transient
+
 # -----------------------------------------------------
 # Helpers
 # -----------------------------------------------------
 
-def _parse_json(raw: str) -> dict:
-    cleaned = re.sub(r"```(?:json)?", "", raw).strip().rstrip("`").strip()
-    return json.loads(cleaned)
+# One client for the whole process so the HTTP connection to Ollama is
+# kept alive between calls; keep_alive keeps the model loaded as well.
+_client = ollama.AsyncClient(timeout=90)
+
+OLLAMA_KEEP_ALIVE = "30m"
+
+# Requests beyond what Ollama runs in parallel only queue up inside it;
+# queue here instead so bursts don't pile onto the model server.
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+
+_ollama_slots = asyncio.Semaphore(OLLAMA_MAX_CONCURRENCY)
+
+# Bulk ingest never holds more than this many of those slots, leaving the
+# rest to interactive requests.
+OLLAMA_BATCH_CONCURRENCY = int(os.getenv("OLLAMA_BATCH_CONCURRENCY", "1"))
+
+_batch_slots = asyncio.Semaphore(OLLAMA_BATCH_CONCURRENCY)
+
+# Output-token caps; generation time grows with every token produced.
+# They leave headroom over the requested length because a capped
+# response is cut-off JSON, which is retried once with double the cap.
+MAX_TOKENS = {"short": 256, "medium": 512, "detailed": 1200}
+HISTORY_MAX_TOKENS = 1200
+
+# JSON schemas passed as Ollama's `format`: decoding is constrained to
+# them server-side, so responses are always plain, parseable JSON.
+DESCRIPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "art_name": {"type": "string"},
+        "art_style": {"type": "string"},
+        "region": {"type": "string"},
+        "english": {"type": "string"},
+    },
+    "required": ["art_name", "art_style", "region", "english"],
+    "additionalProperties": False,
+}
+
+HISTORY_SCHEMA = DESCRIPTION_SCHEMA
+
+
+class OutputTruncated(RuntimeError):
+    """
+    The model reached its output-token cap before finishing its answer.
+    """
+
+    def __init__(self, max_tokens: int):
+        super().__init__(
+            f"Model output was cut off at the {max_tokens}-token limit; "
+            "try a shorter length."
+        )
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    # The client reports refused connections as the builtin ConnectionError.
+    return isinstance(error, (ConnectionError, httpx.TransportError))
 
 
-def _call_ollama(prompt: str, image_path: str) -> str:
+# Each attempt takes its own slot, so backing off never holds one.
+@retry_transient(_is_transient)
+async def _call_ollama(prompt: str, image_bytes: bytes, max_tokens: int, schema: dict) -> str:
     """
     Vision call using Ollama + LLaVA (local & free).
     """
 
-    response = ollama.chat(
-        model="llava",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-                "images": [image_path],  # <-- local image file path
-            }
-        ],
-    )
+    async with _ollama_slots:
+        response = await _client.chat(
+            model="llava",
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                    "images": [image_bytes],  # <-- raw image bytes
+                }
+            ],
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            options={"num_predict": max_tokens},
+            format=schema,
+        )
 
+    if response.get("done_reason") == "length":
+        raise OutputTruncated(max_tokens)
     return response["message"]["content"]
 
 
+async def _call_ollama_stream(prompt: str, image_bytes: bytes, max_tokens: int, schema: dict):
+    """
+    Streaming variant of _call_ollama, yielding content as it arrives.
+    """
+
+    async with _ollama_slots:
+        stream = await _client.chat(
+            model="llava",
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                    "images": [image_bytes],
+                }
+            ],
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            options={"num_predict": max_tokens},
+            format=schema,
+            stream=True,
+        )
+
+        async for part in stream:
+            content = part["message"]["content"]
+            if content:
+                yield content
+
+            # Tokens already went out, so a capped stream can't be retried.
+            if part.get("done_reason") == "length":
+                raise OutputTruncated(max_tokens)
+
+
+async def _generate_json(prompt: str, image_bytes: bytes, max_tokens: int, schema: dict) -> dict:
+    try:
+        raw = await _call_ollama(prompt, image_bytes, max_tokens, schema)
+    except OutputTruncated:
+        raw = await _call_ollama(prompt, image_bytes, max_tokens * 2, schema)
+    return orjson.loads(raw)
+
+
 # -----------------------------------------------------
 # CREATOR MODE
 # -----------------------------------------------------
 
-def generate_description(
-    image_path: str,
-    length: Literal["short", "medium", "detailed"] = "medium",
-    audience: Literal["general", "buyer", "student", "children"] = "general",
-    tone: Literal["poetic", "informative", "storytelling", "academic"] = "poetic",
-) -> dict:
+def _description_prompt(length: str, audience: str, tone: str) -> str:
 
     aud_map = {
         "general": "for the general public",
@@ -56,56 +159,104 @@ def generate_description(
         "detailed": "2–3 rich paragraphs",
     }
 
-    prompt = f"""
-You are an expert on Indian tribal and folk art traditions.
+    return (
+        "You are an expert on Indian tribal and folk art. Analyze the artwork "
+        "in the image and reply with only this JSON: "
+        '{"art_name": "specific name of the artwork", '
+        '"art_style": "tribal art tradition", '
+        '"region": "Indian state or region of origin", '
+        f'"english": "{len_map[length]} in a {tone} tone {aud_map[audience]}, '
+        'covering motifs, cultural significance and symbolism"}'
+    )
+
+
+async def generate_description(
+    image_bytes: bytes,
+    length: Literal["short", "medium", "detailed"] = "medium",
+    audience: Literal["general", "buyer", "student", "children"] = "general",
+    tone: Literal["poetic", "informative", "storytelling", "academic"] = "poetic",
+) -> dict:
+
+    prompt = _description_prompt(length, audience, tone)
+
+    return await _generate_json(prompt, image_bytes, MAX_TOKENS[length], DESCRIPTION_SCHEMA)
 
-Analyze the tribal artwork in the image.
 
-Return ONLY valid JSON with exactly these fields:
+async def generate_description_stream(
+    image_bytes: bytes,
+    length: Literal["short", "medium", "detailed"] = "medium",
+    audience: Literal["general", "buyer", "student", "children"] = "general",
+    tone: Literal["poetic", "informative", "storytelling", "academic"] = "poetic",
+):
+    """
+    Yields text chunks as the model produces them, then the parsed
+    result dict once the response is complete.
+    """
+
+    prompt = _description_prompt(length, audience, tone)
 
-{{
-  "art_name": "Specific name of the artwork",
-  "art_style": "Tribal art tradition identified",
-  "region": "Indian state or region of origin",
-  "english": "A {len_map[length]} description written in a {tone} tone, {aud_map[audience]}. Include motifs, cultural significance, symbolism."
-}}
-"""
+    chunks = []
+    async for chunk in _call_ollama_stream(
+        prompt, image_bytes, MAX_TOKENS[length], DESCRIPTION_SCHEMA
+    ):
+        chunks.append(chunk)
+        yield chunk
 
-    raw = _call_ollama(prompt, image_path)
-    return _parse_json(raw)
+    yield orjson.loads("".join(chunks))
+
+
+async def batch_generate_descriptions(
+    images: list[bytes],
+    length: Literal["short", "medium", "detailed"] = "medium",
+    audience: Literal["general", "buyer", "student", "children"] = "general",
+    tone: Literal["poetic", "informative", "storytelling", "academic"] = "poetic",
+) -> list:
+    """
+    Describe a catalogue of images for offline ingest. Results come back
+    in input order; a failed image yields its exception instead of a dict.
+    Images are downscaled like uploads before they are sent.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    async def _describe(image_bytes: bytes) -> dict:
+        async with _batch_slots:
+            image_bytes = await loop.run_in_executor(
+                None,
+                vision_image_bytes,
+                io.BytesIO(image_bytes),
+                MAX_VISION_PIXELS,
+                vision_side(length),
+            )
+            return await generate_description(
+                image_bytes, length=length, audience=audience, tone=tone
+            )
+
+    return await asyncio.gather(
+        *(_describe(image_bytes) for image_bytes in images),
+        return_exceptions=True,
+    )
 
 
 # -----------------------------------------------------
 # SCHOLAR MODE
 # -----------------------------------------------------
 
-def generate_history(
-    image_path: str,
+async def generate_history(
+    image_bytes: bytes,
     question: str = "Tell me the history and origins of this art form.",
 ) -> dict:
 
     safe_q = question.replace('"', "'")
 
-    prompt = f"""
-You are a renowned scholar of Indian tribal art.
-
-Look at this artwork and answer:
-
-"{safe_q}"
-
-Return ONLY valid JSON:
-
-{{
-  "art_name": "Artwork name",
-  "art_style": "Art tradition",
-  "region": "Region of origin",
-  "question": "{safe_q}",
-  "english": "A scholarly answer in 2–3 detailed paragraphs."
-}}
-"""
-
-    raw = _call_ollama(prompt, image_path)
+    prompt = (
+        f'You are a scholar of Indian tribal art. Looking at this artwork, answer: "{safe_q}" '
+        "Reply with only this JSON: "
+        '{"art_name": "artwork name", "art_style": "art tradition", '
+        '"region": "region of origin", '
+        '"english": "scholarly answer in 2–3 detailed paragraphs"}'
+    )
 
-    data = _parse_json(raw)
+    data = await _generate_json(prompt, image_bytes, HISTORY_MAX_TOKENS, HISTORY_SCHEMA)
     data["question"] = question
     return data
\ No newline at end of file
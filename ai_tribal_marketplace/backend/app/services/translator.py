@@ -1,4 +1,17 @@
-from deep_translator import GoogleTranslator
+import httpx
+import orjson
+
+from ..utils.retry import retry_transient
+
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+
+# One client for all calls and worker threads, so TLS connections are
+# kept alive and multiplexed over HTTP/2 instead of opened per request.
+_http = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+    timeout=30.0,
+)
 
 # Map frontend language names → Google codes
 LANGUAGE_CODES = {
@@ -10,23 +23,31 @@ LANGUAGE_CODES = {
 }
 
 
-def translate(text: str, language: str):
-    if language not in LANGUAGE_CODES:
-        raise ValueError(f"Unsupported language: {language}")
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
 
-    target_code = LANGUAGE_CODES[language]
 
-    return GoogleTranslator(
-        source="auto",
-        target=target_code
-    ).translate(text)
+# Results are cached by TranslatorService, shared with the local backend.
+@retry_transient(_is_transient)
+def _fetch_translation(text: str, target_code: str):
+    response = _http.get(
+        GOOGLE_TRANSLATE_URL,
+        params={"client": "gtx", "sl": "auto", "tl": target_code, "dt": "t", "q": text},
+    )
+    response.raise_for_status()
 
+    # Sentences come back as [[translated, original, ...], ...]
+    return "".join(segment[0] for segment in orjson.loads(response.content)[0] if segment[0])
 
-def batch_translate(text: str, languages: list):
-    translations = {"english": text}
 
-    for lang in languages:
-        if lang in LANGUAGE_CODES:
-            translations[lang] = translate(text, lang)
+def translate(text: str, language: str):
+    """
+    Uncached single call to Google Translate; the backend behind
+    TranslatorService, which callers should use instead.
+    """
+    if language not in LANGUAGE_CODES:
+        raise ValueError(f"Unsupported language: {language}")
 
-    return translations
+    return _fetch_translation(text, LANGUAGE_CODES[language])
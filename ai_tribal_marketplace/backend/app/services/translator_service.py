@@ -0,0 +1,97 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache
+
+from . import translator as google_translator
+from .batcher import MicroBatcher
+
+# Run opus-mt (Marian) locally for the languages it covers instead of
+# calling Google Translate; needs torch and transformers.
+LOCAL_TRANSLATION = os.getenv("LOCAL_TRANSLATION", "0") == "1"
+
+# Local translation requests arriving within this window share one model
+# forward pass per target language.
+TRANSLATION_BATCH_WINDOW_SECONDS = 0.02
+TRANSLATION_BATCH_SIZE = 32
+
+TRANSLATION_CACHE_SIZE = 4096
+
+# Threads for Google calls. They only wait on HTTP, so this is sized for
+# in-flight requests (within the client's connection limit), not CPUs.
+GOOGLE_TRANSLATE_WORKERS = int(os.getenv("GOOGLE_TRANSLATE_WORKERS", "32"))
+
+
+class TranslatorService:
+    """
+    Single entry point for machine translation. Picks the backend per
+    language, batches concurrent requests for the local model and caches
+    results across backends.
+    """
+
+    def __init__(self, local: bool = LOCAL_TRANSLATION):
+        self._local_backend = None
+        if local:
+            from . import marian_translator
+            self._local_backend = marian_translator
+
+        self._google_pool = ThreadPoolExecutor(
+            max_workers=GOOGLE_TRANSLATE_WORKERS, thread_name_prefix="google"
+        )
+
+        # (language, text) -> translation; only touched on the event loop
+        self._cache: LRUCache[tuple[str, str], str] = LRUCache(maxsize=TRANSLATION_CACHE_SIZE)
+
+        self._batcher = MicroBatcher(
+            self._translate_local,
+            max_batch_size=TRANSLATION_BATCH_SIZE,
+            max_wait=TRANSLATION_BATCH_WINDOW_SECONDS,
+        )
+
+    def start(self):
+        self._batcher.start()
+
+    async def stop(self):
+        await self._batcher.stop()
+
+    async def translate_batch(self, text: str, languages: list[str]) -> dict[str, str]:
+        """
+        Translate one text into each of `languages` concurrently.
+        """
+        results = await asyncio.gather(
+            *(self._translate(text, lang) for lang in languages)
+        )
+        return dict(zip(languages, results))
+
+    def _is_local(self, language: str) -> bool:
+        return self._local_backend is not None and language in self._local_backend.MODELS
+
+    def _translate_local(self, texts: list[str], language: str) -> list[str]:
+        # Blocking; the batcher runs it in the default executor.
+        return self._local_backend.translate_batch(texts, language, return_exceptions=True)
+
+    async def _translate(self, text: str, language: str) -> str:
+        translation = self._cache.get((language, text))
+        if translation is not None:
+            return translation
+
+        translation = None
+        if self._is_local(language):
+            try:
+                translation = await self._batcher.submit(text, language)
+            except self._local_backend.TranslationTooLong:
+                pass  # never keep a cut-off translation; Google takes it
+
+        if translation is None:
+            # Google takes one text per call, so each runs in its own
+            # worker thread rather than queueing behind a batch.
+            translation = await asyncio.get_running_loop().run_in_executor(
+                self._google_pool, google_translator.translate, text, language
+            )
+
+        self._cache[(language, text)] = translation
+        return translation
+
+
+translator_service = TranslatorService()
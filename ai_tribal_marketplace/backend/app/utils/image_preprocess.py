@@ -1,6 +1,64 @@
+import io
+import os
 from PIL import Image
 
+# Vision models gain nothing from larger inputs; they only cost bandwidth.
+MAX_VISION_PIXELS = 1_300_000
+
+# Long-side caps in pixels; detailed descriptions keep more of the image.
+MAX_VISION_SIDE = int(os.getenv("MAX_VISION_SIDE", "1024"))
+DETAILED_VISION_SIDE = int(os.getenv("DETAILED_VISION_SIDE", "2048"))
+
+RESIZED_JPEG_QUALITY = 85
+
+def vision_side(length):
+    """
+    Long-side cap for a description of the given length.
+    """
+    return DETAILED_VISION_SIDE if length == "detailed" else MAX_VISION_SIDE
+
 def preprocess_image(image_path):
     image = Image.open(image_path)
     image = image.resize((224, 224))
-    return image
\ No newline at end of file
+    return image
+
+def downscale_image(source, max_pixels=MAX_VISION_PIXELS, max_side=MAX_VISION_SIDE):
+    """
+    Shrink the image to at most `max_pixels` and `max_side` on its longer
+    edge, keeping its aspect ratio. Returns None when it is already small
+    enough.
+    """
+    image = Image.open(source)
+    w, h = image.size
+    if w * h <= max_pixels and max(w, h) <= max_side:
+        return None
+
+    scale = min((max_pixels / (w * h)) ** 0.5, max_side / max(w, h))
+    size = (int(w * scale), int(h * scale))
+
+    # JPEGs can be decoded directly at 1/2, 1/4 or 1/8 scale (no-op otherwise).
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    return image.resize(size, Image.LANCZOS)
+
+def vision_image_bytes(source, max_pixels=MAX_VISION_PIXELS, max_side=MAX_VISION_SIDE) -> bytes:
+    """
+    Return the image file's bytes, re-encoded as JPEG only if it had to
+    be downscaled.
+    """
+    resized = downscale_image(source, max_pixels, max_side)
+    if resized is None:
+        source.seek(0)
+        return source.read()
+
+    buffer = io.BytesIO()
+    # Baseline 4:2:0 JPEG is the libjpeg-turbo SIMD fast path.
+    resized.save(
+        buffer,
+        format="JPEG",
+        quality=RESIZED_JPEG_QUALITY,
+        optimize=False,
+        progressive=False,
+        subsampling=2,
+    )
+    return buffer.getvalue()
@@ -0,0 +1,28 @@
+import logging
+
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+logger = logging.getLogger(__name__)
+
+RETRY_ATTEMPTS = 5
+
+def _give_up(retry_state):
+    logger.warning(
+        "Giving up on %s after %d attempts: %r",
+        retry_state.fn.__qualname__,
+        retry_state.attempt_number,
+        retry_state.outcome.exception(),
+    )
+    return retry_state.outcome.result()  # re-raises the last error
+
+def retry_transient(is_transient, attempts=RETRY_ATTEMPTS, max_wait=30):
+    """
+    Retry errors `is_transient` accepts with jittered exponential backoff;
+    any other error fails on the first attempt.
+    """
+    return retry(
+        retry=retry_if_exception(is_transient),
+        wait=wait_random_exponential(multiplier=1, max=max_wait),
+        stop=stop_after_attempt(attempts),
+        retry_error_callback=_give_up,
+    )
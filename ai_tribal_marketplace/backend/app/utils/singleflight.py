@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on the shared future when the caller doing the work is cancelled.
+    """
+
+
+class SingleFlight:
+    """
+    Runs `run()` once per key; concurrent callers with the same key await
+    the first caller's result instead of repeating the work.
+    """
+
+    def __init__(self):
+        # key -> future of the call currently running for it
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        while (pending := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                pass  # take over the work, or join whoever already did
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await run()
+        except asyncio.CancelledError:
+            # Not fut.cancel(): waiters must tell this apart from their own
+            # cancellation.
+            fut.set_exception(_LeaderCancelled())
+            fut.exception()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
@@ -1,13 +1,3 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-
-# Choose model:
-# Change "en-hi" / "en-mr" / "en-bn"
-MODEL = "Helsinki-NLP/opus-mt-en-hi"
-
-tokenizer = AutoTokenizer.from_pretrained(MODEL)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL)
-
-def translate(text):
-    inputs = tokenizer(text, return_tensors="pt", padding=True)
-    outputs = model.generate(**inputs, max_length=100)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+# The Marian translator now lives in the backend, behind TranslatorService;
+# this module keeps `from translator import translate` working.
+from backend.app.services.marian_translator import MODELS, translate, translate_batch